@@ -1,113 +1,145 @@
 #!/usr/bin/env python3
 import struct
 import json
-import zlib
+from json.encoder import encode_basestring as _json_str
 import argparse
+import codecs
+import mmap
 import os
 import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Union, BinaryIO
+from typing import List, Tuple, Union
 
-# Константы
-ENTRY_NAME_SIZE = 56
-
-
-class ResName:
-    """Variable-length SHIFT-JIS-encoded resource name"""
-
-    def __init__(self, value: str = ""):
-        self.value = value
-
-    @classmethod
-    def from_bytes(cls, data: bytes) -> "ResName":
-        """Read from binary data"""
-        length = struct.unpack("<I", data[:4])[0]
-        sj_bytes = data[4 : 4 + length]
-        try:
-            value = sj_bytes.decode("shift_jis")
-        except UnicodeDecodeError:
-            value = sj_bytes.decode("shift_jis", errors="replace")
-        return cls(value)
+try:
+    # Optional faster deflate implementation with zlib-compatible API
+    from isal import isal_zlib as _zlib
+except ImportError:
+    import zlib as _zlib
 
-    def to_bytes(self) -> bytes:
-        """Convert to binary representation"""
-        try:
-            encoded = self.value.encode("shift_jis")
-        except UnicodeEncodeError:
-            # Fallback: replace problematic characters
-            encoded = self.value.encode("shift_jis", errors="replace")
-
-        length = len(encoded)
-        return struct.pack("<I", length) + encoded
-
-    def to_json(self) -> str:
-        return self.value
+try:
+    # Optional faster JSON implementation
+    import orjson
+except ImportError:
+    orjson = None
 
-    @classmethod
-    def from_json(cls, value: str) -> "ResName":
-        return cls(value)
+# Константы
+ENTRY_NAME_SIZE = 56
+TTP_HEADER_SIZE = 16
+TTP_MIN_FRAME_SIZE = 3 * 4 + 20  # three empty names + numeric values
+TTP_KNOWN_TYPES = (0, 1, 2, 3)
+TTP_MAX_WINDOW_SIZE = 8192
+WRITE_BUFFER_SIZE = 1 << 20
+# Fast level with ratio close to default on sprites, valid for zlib and isal
+DEFAULT_COMPRESS_LEVEL = 3
+# Deflate can't expand data more than ~1032 times, used to sanity check sizes
+DEFLATE_MAX_RATIO = 1032
+
+# Precompiled layouts of fixed-size fields
+_LEN = struct.Struct("<I")
+_OFFSZ = struct.Struct("<II")
+_HDR4 = struct.Struct("<4I")
+_FRAME5 = struct.Struct("<5I")
+_U8 = struct.Struct("<B")
+
+# Codec functions looked up once instead of on every str.encode/bytes.decode
+_sjis_decode = codecs.getdecoder("shift_jis")
+_sjis_encode = codecs.getencoder("shift_jis")
+
+
+def _json_loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8"))
+
+
+def _decode_name(raw: bytes) -> str:
+    """Decode SHIFT-JIS name, replacing undecodable bytes"""
+    return _sjis_decode(raw, "replace")[0]
+
+
+def _decode_names(raws: List[bytes]) -> List[str]:
+    """Decode many SHIFT-JIS names with a single codec call
+
+    0x1C is never a part of multibyte SHIFT-JIS character, so joined names
+    split back unambiguously unless a name contains it or is broken. In
+    that case names are decoded one by one.
+    """
+    try:
+        names = _sjis_decode(b"\x1c".join(raws))[0].split("\x1c")
+    except UnicodeDecodeError:
+        names = None
+    if names is None or len(names) != len(raws):
+        names = [_decode_name(raw) for raw in raws]
+    return names
+
+
+def _scan_frames(
+    data: memoryview, pos: int, count: int
+) -> Tuple[List[bytes], bytearray, int]:
+    """Walk frame table layout without decoding anything
+
+    Returns undecoded resource names (three per frame), numeric values of
+    all frames gathered back to back, so they can be unpacked in one go
+    with _FRAME5.iter_unpack, and end position of table.
+    """
+    raw_names = []
+    values = bytearray()
+    for _ in range(count):
+        for _ in range(3):
+            length = _LEN.unpack_from(data, pos)[0]
+            pos += 4
+            raw_names.append(bytes(data[pos : pos + length]))
+            pos += length
+        values += data[pos : pos + _FRAME5.size]
+        pos += _FRAME5.size
+    if len(values) != count * _FRAME5.size:
+        raise ValueError("Unexpected end of TTP data")
+    return raw_names, values, pos
+
+
+def _resname_pack(value: str) -> bytes:
+    """Convert resource name to binary representation"""
+    # Replace problematic characters
+    encoded = _sjis_encode(value, "replace")[0]
+    return _LEN.pack(len(encoded)) + encoded
 
 
 class TtpFrame:
-    """Frame of animation"""
+    """Frame of animation, read from binary data by TtpFile.from_bytes"""
 
     def __init__(self):
-        self.sprite_name = ResName()
-        self.se_name = ResName()
-        self.textbox_name = ResName()
+        self.sprite_name = ""
+        self.se_name = ""
+        self.textbox_name = ""
         self.delay_ms = 0
         self.x_offset_textbox = 0
         self.y_offset_textbox = 0
         self.x_offset = 0
         self.y_offset = 0
 
-    @classmethod
-    def from_bytes(cls, data: bytes) -> "TtpFrame":
-        """Read from binary data"""
-        frame = cls()
-        pos = 0
-
-        # Read resource names
-        frame.sprite_name = ResName.from_bytes(data[pos:])
-        pos += 4 + len(frame.sprite_name.value.encode("shift_jis"))
-
-        frame.se_name = ResName.from_bytes(data[pos:])
-        pos += 4 + len(frame.se_name.value.encode("shift_jis"))
-
-        frame.textbox_name = ResName.from_bytes(data[pos:])
-        pos += 4 + len(frame.textbox_name.value.encode("shift_jis"))
-
-        # Read numeric values
-        values = struct.unpack("<5I", data[pos : pos + 20])
-        frame.delay_ms = values[0]
-        frame.x_offset_textbox = values[1]
-        frame.y_offset_textbox = values[2]
-        frame.x_offset = values[3]
-        frame.y_offset = values[4]
-
-        return frame
-
     def to_bytes(self) -> bytes:
         """Convert to binary representation"""
-        data = b""
-        data += self.sprite_name.to_bytes()
-        data += self.se_name.to_bytes()
-        data += self.textbox_name.to_bytes()
-        data += struct.pack(
-            "<5I",
-            self.delay_ms,
-            self.x_offset_textbox,
-            self.y_offset_textbox,
-            self.x_offset,
-            self.y_offset,
-        )
-        return data
+        parts = [
+            _resname_pack(self.sprite_name),
+            _resname_pack(self.se_name),
+            _resname_pack(self.textbox_name),
+            _FRAME5.pack(
+                self.delay_ms,
+                self.x_offset_textbox,
+                self.y_offset_textbox,
+                self.x_offset,
+                self.y_offset,
+            ),
+        ]
+        return b"".join(parts)
 
     def to_dict(self) -> dict:
         return {
-            "sprite_name": self.sprite_name.to_json(),
-            "se_name": self.se_name.to_json(),
-            "textbox_name": self.textbox_name.to_json(),
+            "sprite_name": self.sprite_name,
+            "se_name": self.se_name,
+            "textbox_name": self.textbox_name,
             "delay_ms": self.delay_ms,
             "x_offset_textbox": self.x_offset_textbox,
             "y_offset_textbox": self.y_offset_textbox,
@@ -118,9 +150,9 @@ class TtpFrame:
     @classmethod
     def from_dict(cls, data: dict) -> "TtpFrame":
         frame = cls()
-        frame.sprite_name = ResName.from_json(data["sprite_name"])
-        frame.se_name = ResName.from_json(data["se_name"])
-        frame.textbox_name = ResName.from_json(data["textbox_name"])
+        frame.sprite_name = data["sprite_name"]
+        frame.se_name = data["se_name"]
+        frame.textbox_name = data["textbox_name"]
         frame.delay_ms = data["delay_ms"]
         frame.x_offset_textbox = data["x_offset_textbox"]
         frame.y_offset_textbox = data["y_offset_textbox"]
@@ -129,6 +161,20 @@ class TtpFrame:
         return frame
 
 
+# Frame as written by json.dumps(..., indent=2) inside TtpFile.to_dict()
+_FRAME_JSON = """\
+    {
+      "sprite_name": %s,
+      "se_name": %s,
+      "textbox_name": %s,
+      "delay_ms": %d,
+      "x_offset_textbox": %d,
+      "y_offset_textbox": %d,
+      "x_offset": %d,
+      "y_offset": %d
+    }"""
+
+
 class TtpFile:
     """Encoded animation"""
 
@@ -141,55 +187,64 @@ class TtpFile:
         self.onetime_wakeup_dont_play_sound = None
 
     @classmethod
-    def from_bytes(cls, data: bytes) -> "TtpFile":
+    def from_bytes(cls, data: Union[bytes, memoryview]) -> "TtpFile":
         """Read from binary data"""
         ttp = cls()
         pos = 0
+        data = memoryview(data)  # Only name contents are copied out of it
 
         # Read header
-        header = struct.unpack("<4I", data[pos : pos + 16])
+        header = _HDR4.unpack_from(data, pos)
         ttp.maybe_ttp_type = header[0]
         ttp.frame_count = header[1]
         ttp.window_width = header[2]
         ttp.window_height = header[3]
         pos += 16
 
-        # Read frames
+        # Gather all frame fields first, then decode names and values in bulk
+        raw_names, values, pos = _scan_frames(data, pos, ttp.frame_count)
+        names = iter(_decode_names(raw_names))
+
         ttp.frames = []
-        for _ in range(ttp.frame_count):
-            frame = TtpFrame.from_bytes(data[pos:])
+        for frame_values in _FRAME5.iter_unpack(values):
+            frame = TtpFrame()
+            frame.sprite_name = next(names)
+            frame.se_name = next(names)
+            frame.textbox_name = next(names)
+            (
+                frame.delay_ms,
+                frame.x_offset_textbox,
+                frame.y_offset_textbox,
+                frame.x_offset,
+                frame.y_offset,
+            ) = frame_values
             ttp.frames.append(frame)
-            pos += 4 + len(frame.sprite_name.value.encode("shift_jis"))
-            pos += 4 + len(frame.se_name.value.encode("shift_jis"))
-            pos += 4 + len(frame.textbox_name.value.encode("shift_jis"))
-            pos += 20
 
         # Read optional flag
         if ttp.maybe_ttp_type == 3:
             if pos < len(data):
-                ttp.onetime_wakeup_dont_play_sound = struct.unpack(
-                    "<B", data[pos : pos + 1]
-                )[0]
+                ttp.onetime_wakeup_dont_play_sound = _U8.unpack_from(data, pos)[0]
 
         return ttp
 
     def to_bytes(self) -> bytes:
         """Convert to binary representation"""
-        data = struct.pack(
-            "<4I",
-            self.maybe_ttp_type,
-            self.frame_count,
-            self.window_width,
-            self.window_height,
-        )
+        parts = [
+            _HDR4.pack(
+                self.maybe_ttp_type,
+                self.frame_count,
+                self.window_width,
+                self.window_height,
+            )
+        ]
 
         for frame in self.frames:
-            data += frame.to_bytes()
+            parts.append(frame.to_bytes())
 
         if self.maybe_ttp_type == 3 and self.onetime_wakeup_dont_play_sound is not None:
-            data += struct.pack("<B", self.onetime_wakeup_dont_play_sound)
+            parts.append(_U8.pack(self.onetime_wakeup_dont_play_sound))
 
-        return data
+        return b"".join(parts)
 
     def to_dict(self) -> dict:
         result = {
@@ -207,6 +262,46 @@ class TtpFile:
 
         return result
 
+    def to_json_bytes(self) -> bytes:
+        """Same as indented JSON of to_dict(), built without intermediate dicts"""
+        parts = [
+            "{\n"
+            f'  "maybe_ttp_type": {self.maybe_ttp_type:d},\n'
+            f'  "frame_count": {self.frame_count:d},\n'
+            f'  "window_width": {self.window_width:d},\n'
+            f'  "window_height": {self.window_height:d},\n'
+        ]
+
+        if self.frames:
+            frames = ",\n".join(
+                [
+                    _FRAME_JSON
+                    % (
+                        _json_str(frame.sprite_name),
+                        _json_str(frame.se_name),
+                        _json_str(frame.textbox_name),
+                        frame.delay_ms,
+                        frame.x_offset_textbox,
+                        frame.y_offset_textbox,
+                        frame.x_offset,
+                        frame.y_offset,
+                    )
+                    for frame in self.frames
+                ]
+            )
+            parts.append(f'  "frames": [\n{frames}\n  ]')
+        else:
+            parts.append('  "frames": []')
+
+        if self.onetime_wakeup_dont_play_sound is not None:
+            parts.append(
+                ',\n  "onetime_wakeup_dont_play_sound": '
+                f"{self.onetime_wakeup_dont_play_sound:d}"
+            )
+
+        parts.append("\n}")
+        return "".join(parts).encode("utf-8")
+
     @classmethod
     def from_dict(cls, data: dict) -> "TtpFile":
         ttp = cls()
@@ -219,6 +314,36 @@ class TtpFile:
         return ttp
 
 
+def _looks_like_ttp(data: bytes, size: int) -> bool:
+    """Check that data can be parsed as TTP without doing a full parse
+
+    Header must be plausible and all name lengths of frame table must stay
+    within size. Nothing is decoded and no frames are built.
+    """
+    size = min(size, len(data))
+    if size < TTP_HEADER_SIZE:
+        return False
+
+    ttp_type, frame_count, width, height = _HDR4.unpack_from(data, 0)
+    if not (
+        ttp_type in TTP_KNOWN_TYPES
+        and TTP_HEADER_SIZE + frame_count * TTP_MIN_FRAME_SIZE <= size
+        and width <= TTP_MAX_WINDOW_SIZE
+        and height <= TTP_MAX_WINDOW_SIZE
+    ):
+        return False
+
+    # Walk name lengths of every frame
+    pos = TTP_HEADER_SIZE
+    for _ in range(frame_count):
+        for _ in range(3):
+            if pos + 4 > size:
+                return False
+            pos += 4 + _LEN.unpack_from(data, pos)[0]
+        pos += _FRAME5.size
+    return pos <= size
+
+
 class PacFile:
     """Representation of files found in archive"""
 
@@ -228,51 +353,57 @@ class PacFile:
         self.file_type = "other"
         self.data = b""
         self.uncompressed_size = 0
+        self.ttp_header = None
+        self._ttp = None
 
     @classmethod
-    def from_bytes(cls, data: bytes, size: int) -> "PacFile":
+    def from_bytes(cls, data: Union[bytes, memoryview], size: int) -> "PacFile":
         """Read from binary data"""
         pac_file = cls()
 
-        if data.startswith(b"ZLC3"):
+        if data[:4] == b"ZLC3":
             # BMZ file
             pac_file.file_type = "bmz"
-            pac_file.uncompressed_size = struct.unpack("<I", data[4:8])[0]
+            pac_file.uncompressed_size = _LEN.unpack_from(data, 4)[0]
             pac_file.data = data[8:size]
-        elif data[:4] == b"\x00\x00\x00\x00" or True:  # Assume TTP based on structure
-            try:
-                # Try to parse as TTP
-                ttp = TtpFile.from_bytes(data[:size])
-                pac_file.file_type = "ttp"
-                pac_file.data = data[:size]
-            except:
-                pac_file.file_type = "other"
-                pac_file.data = data[:size]
+        elif _looks_like_ttp(data, size):
+            # TTP file, frames are parsed on demand
+            pac_file.file_type = "ttp"
+            pac_file.ttp_header = _HDR4.unpack_from(data, 0)
+            pac_file.data = data[:size]
         else:
             pac_file.file_type = "other"
             pac_file.data = data[:size]
 
         return pac_file
 
+    @property
+    def ttp(self) -> TtpFile:
+        """Parsed TTP content, read once on first access"""
+        if self._ttp is None:
+            self._ttp = TtpFile.from_bytes(self.data)
+        return self._ttp
+
     def converted_data(self) -> bytes:
         """Get converted data for extraction"""
         if self.file_type == "bmz":
+            # Pre-size output from header, unless header size is implausible
+            bufsize = min(self.uncompressed_size, len(self.data) * DEFLATE_MAX_RATIO)
             try:
-                return zlib.decompress(self.data)
-            except zlib.error as e:
+                return _zlib.decompress(self.data, _zlib.MAX_WBITS, max(bufsize, 1))
+            except _zlib.error as e:
                 raise ValueError(f"Failed to decompress BMZ: {e}")
         elif self.file_type == "ttp":
-            ttp = TtpFile.from_bytes(self.data)
-            return json.dumps(ttp.to_dict(), indent=2, ensure_ascii=False).encode(
-                "utf-8"
-            )
+            if orjson is not None:
+                return orjson.dumps(self.ttp.to_dict(), option=orjson.OPT_INDENT_2)
+            return self.ttp.to_json_bytes()
         else:
             return self.data
 
     def to_bytes(self) -> bytes:
         """Convert to binary representation for packing"""
         if self.file_type == "bmz":
-            header = b"ZLC3" + struct.pack("<I", self.uncompressed_size)
+            header = b"ZLC3" + _LEN.pack(self.uncompressed_size)
             return header + self.data
         else:
             return self.data
@@ -288,17 +419,25 @@ class PacFile:
         return {"bmz": "bmp", "ttp": "json"}.get(orig_ext, orig_ext)
 
     @classmethod
-    def convert_back(cls, data: bytes, conv_extension: str) -> "PacFile":
+    def convert_back(
+        cls,
+        data: bytes,
+        conv_extension: str,
+        compress_level: int = DEFAULT_COMPRESS_LEVEL,
+    ) -> "PacFile":
         """Build file from raw data for packing"""
         pac_file = cls()
 
         if conv_extension == "bmp":
             pac_file.file_type = "bmz"
             pac_file.uncompressed_size = len(data)
-            pac_file.data = zlib.compress(data)
+            compressor = _zlib.compressobj(
+                compress_level, _zlib.DEFLATED, _zlib.MAX_WBITS, 9
+            )
+            pac_file.data = compressor.compress(data) + compressor.flush()
         elif conv_extension == "json":
             pac_file.file_type = "ttp"
-            ttp_dict = json.loads(data.decode("utf-8"))
+            ttp_dict = _json_loads(data)
             ttp = TtpFile.from_dict(ttp_dict)
             pac_file.data = ttp.to_bytes()
         else:
@@ -318,45 +457,51 @@ class PacEntry:
         self.file_data = PacFile()
 
     @classmethod
-    def from_file(cls, f: BinaryIO) -> "PacEntry":
-        """Read entry from file"""
+    def from_buffer(
+        cls, buf: Union[bytes, mmap.mmap], pos: int, name: str
+    ) -> "PacEntry":
+        """Read entry whose header starts at pos of the archive buffer
+
+        Name is decoded by caller from raw_name, so names of all entries can
+        be decoded at once.
+        """
         entry = cls()
 
         # Read offset and size
-        offset_size_data = f.read(8)
-        if len(offset_size_data) < 8:
+        if pos + PacEntry.ENTRY_HEADER_SIZE > len(buf):
             raise EOFError("Unexpected end of file")
 
-        entry.offset, entry.size = struct.unpack("<II", offset_size_data)
+        entry.offset, entry.size = _OFFSZ.unpack_from(buf, pos)
+        entry.name = name
 
-        # Read name
-        name_data = f.read(ENTRY_NAME_SIZE)
-        try:
-            # Find null terminator
-            null_pos = name_data.find(b"\x00")
-            if null_pos != -1:
-                name_data = name_data[:null_pos]
-            entry.name = name_data.decode("shift_jis")
-        except UnicodeDecodeError:
-            entry.name = name_data.decode("shift_jis", errors="replace")
-
-        # Store current position and read file data
-        current_pos = f.tell()
-        f.seek(entry.offset)
-        file_bytes = f.read(entry.size)
+        # Read file data, slicing copies it out of the buffer
+        file_bytes = buf[entry.offset : entry.offset + entry.size]
         entry.file_data = PacFile.from_bytes(file_bytes, entry.size)
-        f.seek(current_pos)
 
         return entry
 
+    @staticmethod
+    def raw_name(buf: Union[bytes, mmap.mmap], pos: int) -> bytes:
+        """Get undecoded name of entry whose header starts at pos"""
+        name_data = buf[pos + 8 : pos + PacEntry.ENTRY_HEADER_SIZE]
+        # Find null terminator
+        null_pos = name_data.find(b"\x00")
+        if null_pos != -1:
+            name_data = name_data[:null_pos]
+        return name_data
+
     def to_bytes(self) -> bytes:
         """Convert to binary representation for packing"""
-        name_encoded = self.name.encode("shift_jis", errors="replace")[
+        header = bytearray(PacEntry.ENTRY_HEADER_SIZE)
+        _OFFSZ.pack_into(header, 0, self.offset, self.size)
+
+        # Name is null-terminated, rest of zero-filled header is padding
+        name_encoded = _sjis_encode(self.name, "replace")[0][
             : ENTRY_NAME_SIZE - 1
         ]
-        name_padded = name_encoded + b"\x00" * (ENTRY_NAME_SIZE - len(name_encoded))
+        header[_OFFSZ.size : _OFFSZ.size + len(name_encoded)] = name_encoded
 
-        return struct.pack("<II", self.offset, self.size) + name_padded
+        return bytes(header)
 
 
 class PacArchive:
@@ -372,40 +517,80 @@ class PacArchive:
         archive = cls()
 
         with open(filename, "rb") as f:
-            # Read entries count
-            entries_count_data = f.read(4)
-            if len(entries_count_data) < 4:
-                raise ValueError("Invalid archive file")
-
-            archive.entries_count = struct.unpack("<I", entries_count_data)[0]
+            try:
+                # Map the whole archive, entries copy their data out of it
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                # Empty or not mappable (pipe, some network shares), read it
+                # front to back in one go instead of seeking for every entry
+                buf = f.read()
 
-            # Read entries
-            archive.entries = []
-            for _ in range(archive.entries_count):
-                entry = PacEntry.from_file(f)
-                archive.entries.append(entry)
+        try:
+            archive._read_entries(buf)
+        finally:
+            # Nothing refers to the mapping anymore, so the file can be
+            # overwritten (e.g. packed back to the same path)
+            if isinstance(buf, mmap.mmap):
+                buf.close()
 
         return archive
 
+    def _read_entries(self, buf: Union[bytes, mmap.mmap]):
+        """Read entries count and entries from the whole archive buffer"""
+        if len(buf) < 4:
+            raise ValueError("Invalid archive file")
+
+        # Read entries count
+        self.entries_count = _LEN.unpack_from(buf, 0)[0]
+
+        headers_end = 4 + self.entries_count * PacEntry.ENTRY_HEADER_SIZE
+        if headers_end > len(buf):
+            raise EOFError("Unexpected end of file")
+        header_positions = range(4, headers_end, PacEntry.ENTRY_HEADER_SIZE)
+
+        # Read entries
+        names = _decode_names([PacEntry.raw_name(buf, pos) for pos in header_positions])
+        self.entries = [
+            PacEntry.from_buffer(buf, pos, name)
+            for pos, name in zip(header_positions, names)
+        ]
+
     def extract_all(self, out_dir: str):
         """Extract and convert all files"""
         out_path = Path(out_dir)
         out_path.mkdir(parents=True, exist_ok=True)
 
-        for entry in self.entries:
-            try:
-                converted_data = entry.file_data.converted_data()
-                orig_ext = Path(entry.name).suffix[1:]  # Remove dot
-                conv_ext = PacFile.converted_ext(orig_ext)
+        # Convert in worker threads (zlib releases the GIL), write in order.
+        # Only a few conversions are pending at once to bound memory use.
+        max_pending = 2 * (os.cpu_count() or 1)
+        entries = iter(self.entries)
+        pending = deque()
+        with ThreadPoolExecutor() as executor:
+            while True:
+                for entry in entries:
+                    future = executor.submit(entry.file_data.converted_data)
+                    pending.append((entry, future))
+                    if len(pending) >= max_pending:
+                        break
+                if not pending:
+                    break
+
+                entry, future = pending.popleft()
+                try:
+                    converted_data = future.result()
+                    orig_ext = Path(entry.name).suffix[1:]  # Remove dot
+                    conv_ext = PacFile.converted_ext(orig_ext)
 
-                output_path = out_path / f"{Path(entry.name).stem}.{conv_ext}"
+                    output_path = out_path / f"{Path(entry.name).stem}.{conv_ext}"
 
-                with open(output_path, "wb") as f:
-                    f.write(converted_data)
+                    with open(output_path, "wb") as f:
+                        f.write(converted_data)
 
-                print(f"Extracted: {output_path}")
-            except Exception as e:
-                print(f"Error extracting {entry.name}: {e}")
+                    print(f"Extracted: {output_path}")
+                except Exception as e:
+                    print(f"Error extracting {entry.name}: {e}")
+                finally:
+                    converted_data = future = None
 
     def list_files(self):
         """List all files in archive"""
@@ -417,11 +602,8 @@ class PacArchive:
             if entry.file_data.file_type == "bmz":
                 info = f"bmz uncompressed size: {entry.file_data.uncompressed_size}"
             elif entry.file_data.file_type == "ttp":
-                try:
-                    ttp = TtpFile.from_bytes(entry.file_data.data)
-                    info = f"ttp type?: {ttp.maybe_ttp_type:<3} w: {ttp.window_width:<4} h: {ttp.window_height:<4} frames: {ttp.frame_count}"
-                except:
-                    info = "ttp (parse error)"
+                ttp_type, frame_count, width, height = entry.file_data.ttp_header
+                info = f"ttp type?: {ttp_type:<3} w: {width:<4} h: {height:<4} frames: {frame_count}"
             else:
                 info = "other file"
 
@@ -436,7 +618,7 @@ class PacArchiveBuilder:
 
     def add_entry(self, file_data: PacFile, name: str):
         """Add new entry to archive"""
-        if len(name.encode("shift_jis")) >= ENTRY_NAME_SIZE:
+        if len(_sjis_encode(name)[0]) >= ENTRY_NAME_SIZE:
             raise ValueError(f"Too long entry name: {name}")
 
         entry = PacEntry()
@@ -446,30 +628,29 @@ class PacArchiveBuilder:
 
     def pack(self, out_path: str):
         """Pack all entries to archive"""
-        with open(out_path, "wb") as f:
+        with open(out_path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
             # Write entries count
-            f.write(struct.pack("<I", len(self.entries)))
+            f.write(_LEN.pack(len(self.entries)))
 
             # Calculate offsets and write header
             current_offset = 4 + PacEntry.ENTRY_HEADER_SIZE * len(self.entries)
 
-            # First pass: write headers with temporary offsets
+            # First pass: serialize files once and build headers
             headers = []
+            payloads = []
             for entry in self.entries:
                 entry.offset = current_offset
                 file_bytes = entry.file_data.to_bytes()
                 entry.size = len(file_bytes)
                 headers.append(entry.to_bytes())
+                payloads.append(file_bytes)
                 current_offset += entry.size
 
             # Write all headers
-            for header in headers:
-                f.write(header)
+            f.writelines(headers)
 
             # Second pass: write file data
-            for entry in self.entries:
-                file_bytes = entry.file_data.to_bytes()
-                f.write(file_bytes)
+            f.writelines(payloads)
 
 
 # Add constant to PacEntry class
@@ -507,6 +688,14 @@ def main():
     )
     pack_parser.add_argument("out_arc", help="Result will be saved to this file")
     pack_parser.add_argument("src_dir", help="Build archive from this directory")
+    pack_parser.add_argument(
+        "--compress-level",
+        type=int,
+        choices=range(_zlib.Z_BEST_COMPRESSION + 1),
+        default=DEFAULT_COMPRESS_LEVEL,
+        metavar="LEVEL",
+        help=f".bmz compression level, 0-{_zlib.Z_BEST_COMPRESSION} (default: %(default)s)",
+    )
 
     args = parser.parse_args()
 
@@ -551,7 +740,9 @@ def main():
                             file_data = f.read()
 
                         conv_ext = file_path.suffix[1:]  # Remove dot
-                        pac_file = PacFile.convert_back(file_data, conv_ext)
+                        pac_file = PacFile.convert_back(
+                            file_data, conv_ext, args.compress_level
+                        )
 
                         orig_ext = PacFile.original_ext(conv_ext)
                         new_name = file_path.with_suffix(f".{orig_ext}").name